@@ -1,14 +1,99 @@
 from abc import ABC, abstractmethod
 from collections import namedtuple
 from datetime import timedelta
-from typing import Optional
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Optional, Union
 
+import hashlib
+import importlib.util
+import inspect
 import logging
+import logging.handlers
+import os
+import warnings
 
-# Configure logging
-logging.basicConfig(filename='cross_flow_model.log', 
-                    level=logging.INFO, 
-                    format='%(asctime)s - %(levelname)s - %(message)s')
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        """
+        Stand-in for numba.njit that leaves the function as plain Python.
+        """
+        def decorator(func):
+            return func
+        return decorator
+
+try:
+    import joblib
+    JOBLIB_AVAILABLE = True
+except ImportError:
+    JOBLIB_AVAILABLE = False
+
+# scipy is only needed for run_simulation(time_step=None) and is imported there,
+# since importing it takes longer than most simulations.
+SCIPY_AVAILABLE = importlib.util.find_spec('scipy') is not None
+
+# Logging is silent unless configured; set CROSS_FLOW_MODEL_LOG to a file path to
+# enable file logging at import, or call configure_logging.
+LOG_FILE_ENV_VAR = 'CROSS_FLOW_MODEL_LOG'
+DEFAULT_LOG_FILE = 'cross_flow_model.log'
+LOG_BUFFER_CAPACITY = 10_000
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+_log_handler = None
+# The file handler behind _log_handler; the same handler unless records are buffered.
+_log_file_handler = None
+
+def configure_logging(path: Optional[str] = None, buffered: bool = True) -> logging.Handler:
+    """
+    Writes the model's INFO and higher log records to a file.
+
+    Args:
+        path (str, optional): Log file path. Defaults to cross_flow_model.log.
+        buffered (bool, optional): Buffer records in memory and write them when a simulation
+                                   completes (or the buffer fills up), instead of on every record.
+
+    Returns:
+        logging.Handler: The handler added to the model's logger.
+    """
+    global _log_handler, _log_file_handler
+    reset_logging()
+
+    _log_file_handler = logging.FileHandler(path or DEFAULT_LOG_FILE)
+    _log_file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    if buffered:
+        _log_handler = logging.handlers.MemoryHandler(LOG_BUFFER_CAPACITY, target=_log_file_handler)
+    else:
+        _log_handler = _log_file_handler
+    logger.addHandler(_log_handler)
+    logger.setLevel(logging.INFO)
+    return _log_handler
+
+def reset_logging() -> None:
+    """
+    Removes the handler added by configure_logging, writing out buffered records, and
+    restores the model's logger level.
+    """
+    global _log_handler, _log_file_handler
+    if _log_handler is None:
+        return
+    logger.removeHandler(_log_handler)
+    # A MemoryHandler flushes and drops its target when closed without closing it, so
+    # the file handler is closed separately (closing a handler twice is harmless).
+    _log_handler.close()
+    _log_file_handler.close()
+    _log_handler = None
+    _log_file_handler = None
+    logger.setLevel(logging.NOTSET)
+
+if os.environ.get(LOG_FILE_ENV_VAR):
+    configure_logging(os.environ[LOG_FILE_ENV_VAR])
 
 # Define named tuples for ranges
 MWCORange = namedtuple('MWCORange', ['min', 'max'])
@@ -18,14 +103,154 @@ ConcentrationFactorRange = namedtuple('ConcentrationFactorRange', ['min', 'max']
 # Define one hour
 ONE_HOUR = timedelta(hours=1)
 
-# Define typical ranges using named tuples
-TYPICAL_RANGES = {
-    'MWCO': MWCORange(1_000, 500_000),  # Da
-    'TMP': TMPRange(50_000, 700_000),   # Pa
-    'Concentration_factor': ConcentrationFactorRange(2, 20) 
-}
+# Define typical ranges as plain constants, used directly by the validation
+_MWCO_MIN, _MWCO_MAX = 1_000, 500_000  # Da
+_TMP_MIN, _TMP_MAX = 50_000, 700_000   # Pa
+_CF_MIN, _CF_MAX = 2, 20
+
+# Typical ranges using named tuples, kept as a read-only view for backwards compatibility
+TYPICAL_RANGES = MappingProxyType({
+    'MWCO': MWCORange(_MWCO_MIN, _MWCO_MAX),  # Da
+    'TMP': TMPRange(_TMP_MIN, _TMP_MAX),   # Pa
+    'Concentration_factor': ConcentrationFactorRange(_CF_MIN, _CF_MAX) 
+})
 CASEIN_MOLECULAR_WEIGHT = 25107.0  # Da
 DEFAULT_TIME_STEP = ONE_HOUR
+# Number of time steps evaluated at once with NumPy when the number of steps is not
+# known up front. The vectorized simulation doubles it until the target is reached.
+VECTORIZED_CHUNK_STEPS = 1024
+SIMULATION_CACHE_DIR = '.cfm_cache'
+
+# Fast-math flags for the compiled loop, without 'nnan'/'ninf': values are not assumed finite.
+FASTMATH_FLAGS = {'contract', 'arcp', 'afn', 'reassoc'}
+
+@njit(cache=True, fastmath=FASTMATH_FLAGS)
+def _simulate_core(v0, tmp, mu, area, cf, dt_sec, A, B, exp, max_steps):
+    """
+    Steps the simplified resistance model until the concentration factor or max_steps
+    is reached; max_steps of -1 means no time limit.
+
+    Returns:
+        tuple: Permeate volume (L), hold-up volume (L), concentration factor and running time (s).
+    """
+    dt_hours = dt_sec / 3600.0
+    target_hold_up_volume = v0 / cf
+    permeate_volume = 0.0
+    hold_up_volume = v0
+    step = 0
+    t_sec = 0.0
+    while hold_up_volume > target_hold_up_volume and step != max_steps:
+        resistance = A + B * t_sec**exp
+        flux = tmp / (mu * resistance)
+        delta_permeate_volume = flux * area * dt_hours
+        permeate_volume += delta_permeate_volume
+        hold_up_volume -= delta_permeate_volume
+        step += 1
+        t_sec = step * dt_sec
+    return permeate_volume, hold_up_volume, v0 / hold_up_volume, t_sec
+
+def _simulate_vectorized(v0, tmp, mu, area, cf, dt_sec, A, B, exp, max_steps):
+    """
+    Same as _simulate_core, but evaluates the permeate volume of every time step with NumPy
+    and stops at the first step where the concentration target is reached.
+    """
+    max_steps = None if max_steps < 0 else max_steps
+    dt_hours = dt_sec / 3600.0
+    flow_coeff = tmp * area / mu
+    # Permeate volume at which V0 / hold-up volume reaches the concentration factor.
+    target_permeate_volume = v0 * (1 - 1 / cf)
+
+    completed_steps = 0
+    permeate_volume = 0.0
+    chunk_steps = VECTORIZED_CHUNK_STEPS
+    while max_steps is None or completed_steps < max_steps:
+        end_step = completed_steps + chunk_steps
+        if max_steps is not None:
+            end_step = min(end_step, max_steps)
+
+        time = np.arange(completed_steps, end_step) * dt_sec
+        resistance = A + B * time**exp
+        permeate_flow_rate = flow_coeff / resistance
+        chunk_permeate_volume = permeate_volume + np.cumsum(permeate_flow_rate) * dt_hours
+
+        index = int(np.searchsorted(chunk_permeate_volume, target_permeate_volume))
+        if index < len(chunk_permeate_volume):
+            completed_steps += index + 1
+            permeate_volume = float(chunk_permeate_volume[index])
+            break
+
+        completed_steps = end_step
+        permeate_volume = float(chunk_permeate_volume[-1])
+        chunk_steps *= 2
+
+    hold_up_volume = v0 - permeate_volume
+    return permeate_volume, hold_up_volume, v0 / hold_up_volume, completed_steps * dt_sec
+
+def _simulate(v0, tmp, mu, area, cf, dt_sec, A, B, exp, max_steps):
+    """
+    Runs the compiled loop when numba is installed, the NumPy version otherwise.
+    """
+    if NUMBA_AVAILABLE:
+        return _simulate_core(v0, tmp, mu, area, cf, dt_sec, A, B, exp, max_steps)
+    return _simulate_vectorized(v0, tmp, mu, area, cf, dt_sec, A, B, exp, max_steps)
+
+# The simulation is a pure function of its scalar inputs, so results can be kept on disk
+# across runs with joblib. Caching is opt-in: set CROSS_FLOW_MODEL_CACHE to a directory
+# or call configure_cache. joblib only hashes the source of the cached function, so the
+# source of the kernels and the settings they are compiled with are hashed into the key
+# as well.
+CACHE_DIR_ENV_VAR = 'CROSS_FLOW_MODEL_CACHE'
+memory = None
+_simulate_cached = None
+_kernel_version = None
+
+def _simulate_versioned(kernel_version, v0, tmp, mu, area, cf, dt_sec, A, B, exp, max_steps):
+    """
+    _simulate with the kernel version as an extra argument, so that it is part of the cache key.
+    """
+    return _simulate(v0, tmp, mu, area, cf, dt_sec, A, B, exp, max_steps)
+
+def _compute_kernel_version() -> str:
+    """
+    Hash of everything that determines the result of _simulate apart from its arguments.
+    """
+    kernel_sources = [inspect.getsource(getattr(kernel, 'py_func', kernel))
+                      for kernel in (_simulate_core, _simulate_vectorized, _simulate)]
+    settings = [str(NUMBA_AVAILABLE), str(sorted(FASTMATH_FLAGS)), str(VECTORIZED_CHUNK_STEPS)]
+    return hashlib.sha256(''.join(kernel_sources + settings).encode()).hexdigest()
+
+def configure_cache(path: str = SIMULATION_CACHE_DIR) -> None:
+    """
+    Keeps the results of closed-form simulations in a joblib disk cache.
+
+    Every lookup hashes the inputs and reads from disk, which takes longer than short
+    simulations do, so only enable the cache for long runs (small time steps or long
+    maximum simulation times).
+
+    Args:
+        path (str, optional): Cache directory. Defaults to .cfm_cache.
+
+    Raises:
+        OSError: If the source of the simulation kernels is not available to version the cache.
+    """
+    global memory, _simulate_cached, _kernel_version
+    if not JOBLIB_AVAILABLE:
+        raise ImportError("joblib is required to cache simulation results.")
+    _kernel_version = _compute_kernel_version()
+    memory = joblib.Memory(path, verbose=0)
+    _simulate_cached = memory.cache(_simulate_versioned)
+
+def disable_cache() -> None:
+    """
+    Stops using the disk cache configured with configure_cache. Cached files are left in place.
+    """
+    global memory, _simulate_cached, _kernel_version
+    memory = None
+    _simulate_cached = None
+    _kernel_version = None
+
+if os.environ.get(CACHE_DIR_ENV_VAR):
+    configure_cache(os.environ[CACHE_DIR_ENV_VAR])
 
 class TerminationCriteria(ABC):
     @abstractmethod
@@ -40,8 +265,15 @@ class MaxSimulationTimeTermination(TerminationCriteria):
     def check_termination(self, current_running_time: timedelta) -> bool:
         is_terminatable = current_running_time >= self.max_time
         if is_terminatable:
-            logging.info(f"Reached maximum simulation time of {self.max_time} h.")
+            logger.info("Reached maximum simulation time of %s h.", self.max_time)
         return is_terminatable
+
+@lru_cache(maxsize=4096)
+def _resistance(t_sec, A, B, exp):
+    """
+    Memoized A + B * t^exp, as the same time steps are evaluated over and over.
+    """
+    return A + B * t_sec**exp
     
 class MembraneResistanceModel(ABC):
     """"
@@ -66,9 +298,17 @@ class SimplifiedResistanceModel(MembraneResistanceModel):
     TIME_COEFFICIENT_B = 1.51e12
     TIME_EXPONENT = 0.4
 
-    def calculate_resistance(self, time: timedelta) -> float:
+    def calculate_resistance(self, time: Union[timedelta, float]) -> float:
+        """
+        Args:
+            time (Union[timedelta, float]): Running time, as a timedelta or in seconds.
+        """
         if time is not None:
-            return self.TIME_COEFFICIENT_A + (self.TIME_COEFFICIENT_B * time.total_seconds()**self.TIME_EXPONENT) 
+            t_sec = time.total_seconds() if isinstance(time, timedelta) else time
+            if t_sec == 0 and self.TIME_EXPONENT > 0:
+                # Nothing worth caching at the start of the run
+                return self.TIME_COEFFICIENT_A
+            return _resistance(t_sec, self.TIME_COEFFICIENT_A, self.TIME_COEFFICIENT_B, self.TIME_EXPONENT)
         # If time is not provided, you might need to handle this case
         # based on the other quantities available in kwargs
         raise NotImplementedError("Resistance calculation without time is not implemented yet.")
@@ -94,6 +334,13 @@ class WaterViscosityModel(ViscosityModel):
     def calculate_viscosity(self) -> float:
         return self.WATER_VISCOSITY
         
+def _uses_closed_form_resistance(resistance_model: MembraneResistanceModel) -> bool:
+    """
+    True when resistance_model computes SimplifiedResistanceModel's A + B * t^exp, so it can be
+    evaluated from its coefficients. Subclasses that override calculate_resistance cannot.
+    """
+    return type(resistance_model).calculate_resistance is SimplifiedResistanceModel.calculate_resistance
+
 class CompletedSimulation:
     def __init__(self, final_permeate_volume, final_retentate_volume, final_concentration, time):
         self.final_permeate_volume = final_permeate_volume
@@ -101,6 +348,16 @@ class CompletedSimulation:
         self.final_concentration = final_concentration
         self.time = time
 
+class CompletedBatchSimulation:
+    """
+    Results of CrossFlowFiltrationModel.simulate_batch, one array element per sample.
+    """
+    def __init__(self, final_permeate_volume, final_retentate_volume, final_concentration, time):
+        self.final_permeate_volume = final_permeate_volume
+        self.final_retentate_volume = final_retentate_volume
+        self.final_concentration = final_concentration
+        self.time = time
+
 class CrossFlowFiltrationModel:
     """
     Initializes the CrossFlowModel with input parameters and dependencies.
@@ -130,22 +387,76 @@ class CrossFlowFiltrationModel:
 
         self.initial_volume = validate_parameter('Volume', volume, positive=True)
         self.initial_concentration = validate_parameter('Concentration', concentration, positive=True)
-        self.tmp = validate_parameter('TMP', tmp, 
-                                         min_value=TYPICAL_RANGES['TMP'].min, 
-                                         max_value=TYPICAL_RANGES['TMP'].max) 
-        self.mwco = validate_parameter('MWCO', mwco, 
-                                         min_value=TYPICAL_RANGES['MWCO'].min, 
-                                         max_value=TYPICAL_RANGES['MWCO'].max)
+        self._tmp = validate_parameter('TMP', tmp, min_value=_TMP_MIN, max_value=_TMP_MAX) 
+        self.mwco = validate_parameter('MWCO', mwco, min_value=_MWCO_MIN, max_value=_MWCO_MAX)
         self.concentration_factor = validate_parameter('Concentration factor', concentration_factor,
-                                                            min_value=TYPICAL_RANGES['Concentration_factor'].min, 
-                                                            max_value=TYPICAL_RANGES['Concentration_factor'].max)
+                                                            min_value=_CF_MIN, max_value=_CF_MAX)
         
         
-        self.membrane_area = membrane_area
-        self.resistance_model = resistance_model
-        self.viscosity_model = viscosity_model
+        self._membrane_area = membrane_area
+        self._resistance_model = resistance_model
+        self._viscosity_model = viscosity_model
         self.termination_criteria = termination_criteria
 
+        self._bind_parameters()
+
+    def _bind_parameters(self) -> None:
+        """
+        Precomputes the constants used on the hot path. Called again whenever one of
+        the parameters they are derived from is assigned.
+        """
+        resistance_model = self._resistance_model
+        # Constants of the closed-form resistance, bound once so the simulation
+        # loop does not go through the model methods on every step.
+        self._closed_form_resistance = _uses_closed_form_resistance(resistance_model)
+        if self._closed_form_resistance:
+            self._A = resistance_model.TIME_COEFFICIENT_A
+            self._B = resistance_model.TIME_COEFFICIENT_B
+            self._exp = resistance_model.TIME_EXPONENT
+        # Bound methods and constants used on the hot path instead of dispatching
+        # through the model interfaces on every call.
+        self._resistance_fn = resistance_model.calculate_resistance
+        self._viscosity = self._viscosity_model.calculate_viscosity()
+        # Permeate flow rate is _flow_coeff / resistance(t); nothing else changes during a run.
+        self._flow_coeff = self._tmp * self._membrane_area / self._viscosity
+
+    # The quantities below are folded into the constants above, so assigning one
+    # recomputes them.
+    @property
+    def tmp(self) -> float:
+        return self._tmp
+
+    @tmp.setter
+    def tmp(self, value: float) -> None:
+        self._tmp = value
+        self._bind_parameters()
+
+    @property
+    def membrane_area(self) -> float:
+        return self._membrane_area
+
+    @membrane_area.setter
+    def membrane_area(self, value: float) -> None:
+        self._membrane_area = value
+        self._bind_parameters()
+
+    @property
+    def resistance_model(self) -> MembraneResistanceModel:
+        return self._resistance_model
+
+    @resistance_model.setter
+    def resistance_model(self, value: MembraneResistanceModel) -> None:
+        self._resistance_model = value
+        self._bind_parameters()
+
+    @property
+    def viscosity_model(self) -> ViscosityModel:
+        return self._viscosity_model
+
+    @viscosity_model.setter
+    def viscosity_model(self, value: ViscosityModel) -> None:
+        self._viscosity_model = value
+        self._bind_parameters()
 
     def calculate_permeate_flow_rate(self, time: timedelta) -> float:
         """
@@ -155,80 +466,302 @@ class CrossFlowFiltrationModel:
             float: Permeate flow rate (L/h). 
         """
         try:
-            flux = self.calculate_flux(time)
-            flow_rate = flux * self.membrane_area
-            logging.info(f"Time: {time} h, Permeate flow rate: {flow_rate} L/h")
+            flow_rate = self._flow_coeff / self._resistance_fn(time)
+            logger.debug("Time: %s h, Permeate flow rate: %s L/h", time, flow_rate)
             return flow_rate
         except Exception as e:
-            logging.error(f"Error calculating permeate flow rate: {e}")
+            logger.error("Error calculating permeate flow rate: %s", e)
             raise  e
         
     def calculate_flux(self, time: timedelta) -> float:
         try:
-            resistance = self.resistance_model.calculate_resistance(time)
-            viscosity = self.viscosity_model.calculate_viscosity()
-            flux = self.tmp / (viscosity * resistance)
-            logging.info(f"Time: {time}h, Flux: {flux} m3•h-1•m-2")
+            flux = self.tmp / (self._viscosity * self._resistance_fn(time))
+            logger.debug("Time: %sh, Flux: %s m3•h-1•m-2", time, flux)
             return flux
         except Exception as e:
-            logging.error(f"Error calculating permeate flux: {e}")
+            logger.error("Error calculating permeate flux: %s", e)
             raise e
     
-    def current_concentration(self, current_volume):
+    def current_concentration_factor(self, current_volume: float) -> float:
+        """
+        Calculates the concentration factor of the retentate.
+
+        Args:
+            current_volume (float): Current hold-up volume (L).
+
+        Returns:
+            float: Initial volume over current volume (dimensionless). Multiply by the
+                   initial concentration to get the retentate concentration (g/L).
+        """
         return self.initial_volume / current_volume
 
+    def current_concentration(self, current_volume: float) -> float:
+        """
+        Deprecated alias of current_concentration_factor, which it returns.
+        """
+        warnings.warn("current_concentration is deprecated; use current_concentration_factor, which returns "
+                      "a dimensionless factor rather than a concentration.", DeprecationWarning, stacklevel=2)
+        return self.current_concentration_factor(current_volume)
+
+    @classmethod
+    def simulate_batch(cls,
+                       params: dict,
+                       time_step: timedelta,
+                       max_time: timedelta,
+                       resistance_model: SimplifiedResistanceModel = SimplifiedResistanceModel(),
+                       viscosity_model: ViscosityModel = WaterViscosityModel()) -> CompletedBatchSimulation:
+        """
+        Runs one simulation per sample in a single vectorized pass, e.g. for parameter sweeps and calibration.
+
+        Args:
+            params (dict): Arrays (or scalars) broadcastable to a common shape, keyed like the
+                           __init__ arguments: volume, concentration, tmp, membrane_area, mwco, concentration_factor.
+            time_step (timedelta): The time step shared by all samples.
+            max_time (timedelta): Maximum simulation time shared by all samples.
+            resistance_model (SimplifiedResistanceModel): Model for membrane resistance.
+            viscosity_model (ViscosityModel): Model for viscosity.
+
+        Returns:
+            CompletedBatchSimulation: Flat arrays with the result of each sample; time is a timedelta64 array.
+        """
+        if not _uses_closed_form_resistance(resistance_model):
+            raise ValueError("simulate_batch requires a resistance model that does not override calculate_resistance.")
+
+        volume, concentration, tmp, membrane_area, mwco, concentration_factor = (
+            np.ravel(array).astype(float) for array in np.broadcast_arrays(
+                params['volume'], params['concentration'], params['tmp'], params['membrane_area'],
+                params['mwco'], params['concentration_factor']))
+
+        # Checking the extremes validates every sample
+        validate_parameter('Volume', volume.min(), positive=True)
+        validate_parameter('Concentration', concentration.min(), positive=True)
+        for param_name, values, min_value, max_value in (('TMP', tmp, _TMP_MIN, _TMP_MAX),
+                                                         ('MWCO', mwco, _MWCO_MIN, _MWCO_MAX),
+                                                         ('Concentration factor', concentration_factor, _CF_MIN, _CF_MAX)):
+            for value in (values.min(), values.max()):
+                validate_parameter(param_name, value, min_value=min_value, max_value=max_value)
+
+        max_steps = max(0, -(-max_time // time_step))
+        time_step_seconds = time_step.total_seconds()
+        time_step_hours = time_step_seconds / ONE_HOUR.total_seconds()
+
+        # Resistance only depends on time, so it is shared by all samples
+        time = np.arange(max_steps) * time_step_seconds
+        resistance = (resistance_model.TIME_COEFFICIENT_A
+                      + resistance_model.TIME_COEFFICIENT_B * time**resistance_model.TIME_EXPONENT)
+        flow_coeff = tmp * membrane_area / viscosity_model.calculate_viscosity()
+        permeate_flow_rate = flow_coeff[:, None] / resistance[None, :]
 
+        # Column k holds the permeate volume after k steps
+        permeate_volume = np.zeros((len(volume), max_steps + 1))
+        np.cumsum(permeate_flow_rate, axis=1, out=permeate_volume[:, 1:])
+        permeate_volume[:, 1:] *= time_step_hours
 
+        target_reached = permeate_volume >= (volume * (1 - 1 / concentration_factor))[:, None]
+        steps = np.where(target_reached.any(axis=1), target_reached.argmax(axis=1), max_steps)
+        steps[CASEIN_MOLECULAR_WEIGHT > mwco] = 0
 
-    def run_simulation(self, time_step: timedelta = DEFAULT_TIME_STEP) -> CompletedSimulation:
+        final_permeate_volume = permeate_volume[np.arange(len(volume)), steps]
+        final_retentate_volume = volume - final_permeate_volume
+        final_concentration = volume / final_retentate_volume
+
+        return CompletedBatchSimulation(final_permeate_volume, final_retentate_volume, final_concentration,
+                                        steps * np.timedelta64(time_step))
+
+
+
+
+    def run_simulation(self, time_step: Optional[timedelta] = DEFAULT_TIME_STEP) -> CompletedSimulation:
         """
         Args:
             time_step (timedelta, optional): The time step for each simulation iteration in hours.  Defaults to 1 hours. 
                                         A smaller time step results in a more accurate simulation but increases computation time.
+                                        Pass None to solve the continuous model for the termination time directly (requires scipy).
 
         Returns:
             CompletedSimulation
         """
 
-        logging.info("Simulation started with time_step: %s h, initial_volume: %s L, target_concentration_factor: %s",
+        logger.info("Simulation started with time_step: %s h, initial_volume: %s L, target_concentration_factor: %s",
                      time_step, self.initial_volume, self.concentration_factor)
 
+        try:
+            if CASEIN_MOLECULAR_WEIGHT > self.mwco:
+                logger.warning("Casein molecular weight exceeds MWCO. Simulation will terminate early.")
+                completed_simulation = CompletedSimulation(0, self.initial_volume, 1.0, timedelta(0))
+            elif time_step is None:
+                completed_simulation = self._run_analytic_simulation()
+            elif self._has_closed_form_trajectory():
+                completed_simulation = self._run_closed_form_simulation(time_step)
+            else:
+                completed_simulation = self._run_stepped_simulation(time_step)
+
+            logger.info("Simulation completed. Final Permeate Volume: %s L, Final Hold-up Volume: %s L, "
+                         "Final Concentration: %s, Total Time: %s",
+                         completed_simulation.final_permeate_volume, completed_simulation.final_retentate_volume,
+                         completed_simulation.final_concentration, completed_simulation.time)
+        finally:
+            # Buffered records are written even when the simulation raises
+            if _log_handler is not None:
+                _log_handler.flush()
+
+        return completed_simulation
+
+    def _has_closed_form_trajectory(self) -> bool:
+        """
+        The whole trajectory can be evaluated at once when resistance is a closed-form
+        function of time and the only termination criterion is a time limit.
+        """
+        return (self._closed_form_resistance
+                and (self.termination_criteria is None
+                     or type(self.termination_criteria).check_termination is MaxSimulationTimeTermination.check_termination))
+
+    def _hold_up_volume(self, t_sec: float) -> float:
+        """
+        Hold-up volume (L) of the continuous model after t_sec seconds.
+
+        The integral is split at one second and taken over log time beyond it, where
+        the integrand is smooth; integrating 1 / (A + B * t**exp) directly from zero
+        does not converge for long runs because of the t**exp cusp at t = 0.
+        """
+        from scipy.integrate import quad
+
+        A, B, exp = self._A, self._B, self._exp
+        head_seconds = min(t_sec, 1.0)
+        integral = quad(lambda s: 1.0 / (A + B * s**exp), 0, head_seconds, epsabs=0, epsrel=1e-10)[0]
+        if t_sec > head_seconds:
+            integral += quad(lambda x: np.exp(x) / (A + B * np.exp(exp * x)), 0, np.log(t_sec),
+                             epsabs=0, epsrel=1e-10, limit=200)[0]
+        return self.initial_volume - self._flow_coeff * integral / ONE_HOUR.total_seconds()
+
+    def _run_analytic_simulation(self) -> CompletedSimulation:
+        """
+        Finds the time at which the continuous model reaches the concentration factor
+        with a root find on the hold-up volume, instead of stepping through time.
+        """
+        if not self._has_closed_form_trajectory():
+            raise ValueError("A time step is required for custom resistance models and termination criteria.")
+        try:
+            from scipy.optimize import brentq
+        except ImportError as e:
+            raise ImportError("scipy is required to run the simulation without a time step.") from e
+
+        target_hold_up_volume = self.initial_volume / self.concentration_factor
+        if self.termination_criteria is not None:
+            upper_seconds = self.termination_criteria.max_time.total_seconds()
+        else:
+            upper_seconds = ONE_HOUR.total_seconds()
+            while self._hold_up_volume(upper_seconds) > target_hold_up_volume:
+                upper_seconds *= 2
+
+        target_reached = self._hold_up_volume(upper_seconds) <= target_hold_up_volume
+        if target_reached:
+            running_seconds = brentq(lambda t: self._hold_up_volume(t) - target_hold_up_volume, 0, upper_seconds)
+        else:
+            running_seconds = upper_seconds
+
+        current_hold_up_volume = self._hold_up_volume(running_seconds)
+        current_permeate_volume = self.initial_volume - current_hold_up_volume
+        current_concentration = self.current_concentration_factor(current_hold_up_volume)
+        if target_reached:
+            logger.info("Concentration target reached %s", current_concentration)
+        else:
+            logger.info("Reached maximum simulation time of %s h.", self.termination_criteria.max_time)
+
+        return CompletedSimulation(current_permeate_volume, current_hold_up_volume, current_concentration,
+                                   timedelta(seconds=running_seconds))
+
+    def _max_steps(self, time_step: timedelta) -> Optional[int]:
+        """
+        Number of steps after which the running time first reaches the maximum simulation time.
+        """
+        if self.termination_criteria is None:
+            return None
+        return max(0, -(-self.termination_criteria.max_time // time_step))
+
+    def _run_closed_form_simulation(self, time_step: timedelta) -> CompletedSimulation:
+        """
+        Runs the simulation of the closed-form resistance model, reusing cached results when available.
+        """
+        max_steps = self._max_steps(time_step)
+        args = (float(self.initial_volume), float(self.tmp), float(self._viscosity),
+                float(self.membrane_area), float(self.concentration_factor), time_step.total_seconds(),
+                float(self._A), float(self._B), float(self._exp), -1 if max_steps is None else int(max_steps))
+
+        if _simulate_cached is not None:
+            simulation_result = _simulate_cached(_kernel_version, *args)
+        else:
+            simulation_result = _simulate(*args)
+        current_permeate_volume, current_hold_up_volume, current_concentration, running_seconds = simulation_result
+
+        if current_hold_up_volume <= self.initial_volume / self.concentration_factor:
+            logger.info("Concentration target reached %s", current_concentration)
+        else:
+            logger.info("Reached maximum simulation time of %s h.", self.termination_criteria.max_time)
+
+        return CompletedSimulation(current_permeate_volume, current_hold_up_volume, current_concentration,
+                                   timedelta(seconds=running_seconds))
+
+    def _run_stepped_simulation(self, time_step: timedelta) -> CompletedSimulation:
+        """
+        Advances the simulation one time step at a time, for resistance models and
+        termination criteria that cannot be evaluated ahead of time.
+        """
         current_hold_up_volume = self.initial_volume
-        current_concentration = 0
         current_permeate_volume = 0
-        current_running_time = timedelta(0)
+        # Comparing volumes avoids computing the concentration factor on every step
+        target_hold_up_volume = self.initial_volume / self.concentration_factor
+        # Running time is kept as a step count; timedeltas are only built for the
+        # termination criteria and resistance models, which take a timedelta.
+        steps = 0
+
+        time_step_seconds = time_step.total_seconds()
+        time_step_hours = time_step_seconds / ONE_HOUR.total_seconds()
+        closed_form_resistance = self._closed_form_resistance
+        # Everything that is fixed for the run is bound to locals here, so the loop
+        # body does no attribute lookups.
+        flow_coeff_dt = self._flow_coeff * time_step_hours
+        if closed_form_resistance:
+            A, B, exp = self._A, self._B, self._exp
+            # The permeate volume of each step is evaluated with NumPy a chunk of steps
+            # at a time and looked up per step, instead of a scalar pow on every step.
+            chunk_start = chunk_end = 0
+        else:
+            resistance_fn = self._resistance_fn
+        check_termination = self.termination_criteria.check_termination if self.termination_criteria else None
+        log_steps = logger.isEnabledFor(logging.DEBUG)
 
         while True:
             # Check for termination criteria
-            if CASEIN_MOLECULAR_WEIGHT > self.mwco:
-                logging.warning("Casein molecular weight exceeds MWCO. Simulation will terminate early.")
+            if current_hold_up_volume <= target_hold_up_volume:
+                logger.info("Concentration target reached %s", self.current_concentration_factor(current_hold_up_volume))
                 break
-            if current_concentration >= self.concentration_factor:
-                logging.info(f"Concentration target reached {current_concentration}")
+            if check_termination is not None and check_termination(steps * time_step):
                 break
-            if self.termination_criteria and self.termination_criteria.check_termination(current_running_time):
-                break
-
-            permeate_flow_rate = self.calculate_permeate_flow_rate(current_running_time)
 
-            delta_permeate_volume = permeate_flow_rate * time_step.total_seconds() / ONE_HOUR.total_seconds()
+            if closed_form_resistance:
+                if steps == chunk_end:
+                    chunk_start, chunk_end = steps, steps + VECTORIZED_CHUNK_STEPS
+                    time = np.arange(chunk_start, chunk_end) * time_step_seconds
+                    # Same arithmetic as calculate_permeate_flow_rate, inlined
+                    chunk_permeate_volume = (flow_coeff_dt / (A + B * time**exp)).tolist()
+                delta_permeate_volume = chunk_permeate_volume[steps - chunk_start]
+            else:
+                delta_permeate_volume = flow_coeff_dt / resistance_fn(steps * time_step)
             current_permeate_volume += delta_permeate_volume
             current_hold_up_volume -= delta_permeate_volume
-            current_running_time += time_step
-            current_concentration = self.current_concentration(current_hold_up_volume)
-
-            
-
-            logging.info(
-                "Time: %s, Permeate Volume: %s L, Hold-up Volume: %s L, Concentration: %s",
-                current_running_time, current_permeate_volume, current_hold_up_volume, current_concentration
-            )
-
-        logging.info("Simulation completed. Final Permeate Volume: %s L, Final Hold-up Volume: %s L, "
-                     "Final Concentration: %s, Total Time: %s",
-                     current_permeate_volume, current_hold_up_volume, current_concentration, current_running_time)
-
-        return CompletedSimulation(current_permeate_volume, current_hold_up_volume, current_concentration, current_running_time)
+            steps += 1
+
+            if log_steps:
+                logger.debug(
+                    "Time: %s s, Permeate Volume: %s L, Hold-up Volume: %s L, Concentration factor: %s",
+                    steps * time_step_seconds, current_permeate_volume, current_hold_up_volume,
+                    self.current_concentration_factor(current_hold_up_volume)
+                )
+
+        return CompletedSimulation(current_permeate_volume, current_hold_up_volume,
+                                   self.current_concentration_factor(current_hold_up_volume),
+                                   timedelta(seconds=steps * time_step_seconds))
 
 def validate_parameter(param_name, value, positive=False, min_value=None, max_value=None):
     """
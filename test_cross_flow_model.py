@@ -1,6 +1,13 @@
+import logging
+import logging.handlers
+import os
+import tempfile
 import unittest
+import warnings
+import core
 from core import CrossFlowFiltrationModel, SimplifiedResistanceModel, WaterViscosityModel, CompletedSimulation, MaxSimulationTimeTermination
-from core import validate_parameter
+from core import TerminationCriteria, MembraneResistanceModel, ViscosityModel, TYPICAL_RANGES
+from core import validate_parameter, configure_logging, reset_logging, logger, configure_cache, disable_cache, JOBLIB_AVAILABLE, _simulate_core, _simulate_vectorized, SCIPY_AVAILABLE
 
 from datetime import timedelta
 
@@ -8,6 +15,70 @@ ONE_HOUR = timedelta(hours=1)
 TERMINATION_CRITERIA_FOR_TEST = MaxSimulationTimeTermination(5*ONE_HOUR)
 
 
+class SteppedMaxTimeTermination(TerminationCriteria):
+    """
+    Same limit as MaxSimulationTimeTermination, but opaque to the model so the
+    simulation has to advance one time step at a time.
+    """
+    def __init__(self, max_time: timedelta):
+        self.max_time = max_time
+
+    def check_termination(self, current_running_time: timedelta) -> bool:
+        return current_running_time >= self.max_time
+
+
+class DelegatingResistanceModel(MembraneResistanceModel):
+    """
+    Same resistance as the wrapped model (SimplifiedResistanceModel by default), but only
+    reachable through calculate_resistance.
+    """
+    def __init__(self, resistance_model: MembraneResistanceModel = None):
+        self.resistance_model = resistance_model or SimplifiedResistanceModel()
+
+    def calculate_resistance(self, time: timedelta) -> float:
+        return self.resistance_model.calculate_resistance(time)
+
+
+class ConstantResistanceModel(SimplifiedResistanceModel):
+    """
+    Only changes the coefficients: resistance no longer depends on time.
+    """
+    TIME_EXPONENT = 0.0
+
+
+
+class ZeroResistanceModel(MembraneResistanceModel):
+    """
+    Makes the permeate flow rate calculation divide by zero.
+    """
+    def calculate_resistance(self, time: timedelta) -> float:
+        return 0.0
+
+
+class ScaledResistanceModel(SimplifiedResistanceModel):
+    """
+    Overrides calculate_resistance, so its coefficients alone do not describe it.
+    """
+    def calculate_resistance(self, time: timedelta) -> float:
+        return 10 * super().calculate_resistance(time)
+
+
+class EarlyMaxTimeTermination(MaxSimulationTimeTermination):
+    """
+    Overrides check_termination to stop two hours before max_time.
+    """
+    def check_termination(self, current_running_time: timedelta) -> bool:
+        return current_running_time >= self.max_time - 2*ONE_HOUR
+
+
+class DoubleViscosityModel(ViscosityModel):
+    """
+    Twice the viscosity of water.
+    """
+    def calculate_viscosity(self) -> float:
+        return 2 * WaterViscosityModel().calculate_viscosity()
+
+
 class TestCrossFlowFiltrationModel(unittest.TestCase):
     
     def setUp(self):
@@ -15,6 +86,8 @@ class TestCrossFlowFiltrationModel(unittest.TestCase):
         This method runs before each test. We use it to set up the environment
         needed for each test, including creating instances of the objects we're testing.
         """
+        # Results must come from the simulation code under test, never from a disk cache
+        disable_cache()
         self.volume = 1 
         self.concentration = 10.0
         self.tmp = 100000.0
@@ -43,6 +116,47 @@ class TestCrossFlowFiltrationModel(unittest.TestCase):
         self.assertGreater(flow_rate, 0, "Permeate flow rate should be positive")
 
 
+    def test_assigning_model_parameters_updates_simulation(self):
+        """
+        Test that assigning a parameter folded into the precomputed flow coefficient takes effect on every path.
+        """
+        for name, value in (('tmp', 500000.0), ('membrane_area', 10.0),
+                            ('resistance_model', ConstantResistanceModel()),
+                            ('resistance_model', ScaledResistanceModel()),
+                            ('viscosity_model', DoubleViscosityModel())):
+            model = CrossFlowFiltrationModel(
+                self.volume, self.concentration, self.tmp, self.membrane_area, self.mwco,
+                self.concentration_factor, termination_criteria=self.termination_criteria
+            )
+            stepped = CrossFlowFiltrationModel(
+                self.volume, self.concentration, self.tmp, self.membrane_area, self.mwco,
+                self.concentration_factor, termination_criteria=SteppedMaxTimeTermination(5*ONE_HOUR)
+            )
+            setattr(model, name, value)
+            setattr(stepped, name, value)
+            self.assertIs(getattr(model, name), value)
+
+            parameters = dict(volume=self.volume, concentration=self.concentration, tmp=self.tmp,
+                              membrane_area=self.membrane_area, mwco=self.mwco,
+                              concentration_factor=self.concentration_factor,
+                              termination_criteria=self.termination_criteria)
+            parameters[name] = value
+            expected = CrossFlowFiltrationModel(**parameters)
+            self.assertEqual(model.calculate_permeate_flow_rate(2*ONE_HOUR), expected.calculate_permeate_flow_rate(2*ONE_HOUR))
+            self.assertEqual(model.calculate_flux(2*ONE_HOUR), expected.calculate_flux(2*ONE_HOUR))
+            closed_form_result = model.run_simulation(time_step=ONE_HOUR)
+            stepped_result = stepped.run_simulation(time_step=ONE_HOUR)
+            expected_result = expected.run_simulation(time_step=ONE_HOUR)
+            self.assertAlmostEqual(closed_form_result.final_permeate_volume, expected_result.final_permeate_volume)
+            self.assertAlmostEqual(stepped_result.final_permeate_volume, expected_result.final_permeate_volume)
+
+    def test_calculate_flux_without_membrane_area(self):
+        model = CrossFlowFiltrationModel(
+            self.volume, self.concentration, self.tmp, 0.0, self.mwco, self.concentration_factor
+        )
+        self.assertEqual(model.calculate_flux(2*ONE_HOUR), self.model.calculate_flux(2*ONE_HOUR))
+        self.assertEqual(model.calculate_permeate_flow_rate(2*ONE_HOUR), 0)
+
     def test_run_simulation(self):
         """
         Test the entire simulation to check if it runs without errors and returns expected results.
@@ -54,6 +168,269 @@ class TestCrossFlowFiltrationModel(unittest.TestCase):
         self.assertGreater(simulation_result.final_concentration, 0, "Final concentration should be positive")
         self.assertGreater(simulation_result.time, timedelta(0), "Simulation time should be positive")
     
+    def test_vectorized_simulation_matches_stepped_simulation(self):
+        """
+        Test that the vectorized simulation reproduces the step-by-step simulation.
+        """
+        for max_time in (5*ONE_HOUR, 10_000*ONE_HOUR):
+            vectorized = CrossFlowFiltrationModel(
+                self.volume, self.concentration, self.tmp, self.membrane_area, self.mwco,
+                self.concentration_factor, termination_criteria=MaxSimulationTimeTermination(max_time)
+            ).run_simulation(time_step=ONE_HOUR)
+            stepped = CrossFlowFiltrationModel(
+                self.volume, self.concentration, self.tmp, self.membrane_area, self.mwco,
+                self.concentration_factor, termination_criteria=SteppedMaxTimeTermination(max_time)
+            ).run_simulation(time_step=ONE_HOUR)
+            self.assertEqual(vectorized.time, stepped.time)
+            self.assertAlmostEqual(vectorized.final_permeate_volume, stepped.final_permeate_volume)
+            self.assertAlmostEqual(vectorized.final_retentate_volume, stepped.final_retentate_volume)
+            self.assertAlmostEqual(vectorized.final_concentration, stepped.final_concentration)
+
+    def test_stepped_simulation_with_custom_resistance_model(self):
+        """
+        Test that stepping through the resistance model gives the same result as the inlined resistance.
+        """
+        termination_criteria = SteppedMaxTimeTermination(50*ONE_HOUR)
+        inlined = CrossFlowFiltrationModel(
+            self.volume, self.concentration, self.tmp, self.membrane_area, self.mwco,
+            self.concentration_factor, termination_criteria=termination_criteria
+        ).run_simulation(time_step=ONE_HOUR)
+        delegated = CrossFlowFiltrationModel(
+            self.volume, self.concentration, self.tmp, self.membrane_area, self.mwco,
+            self.concentration_factor, termination_criteria=termination_criteria,
+            resistance_model=DelegatingResistanceModel()
+        ).run_simulation(time_step=ONE_HOUR)
+        self.assertEqual(inlined.time, delegated.time)
+        self.assertAlmostEqual(inlined.final_permeate_volume, delegated.final_permeate_volume)
+        self.assertAlmostEqual(inlined.final_concentration, delegated.final_concentration)
+
+    def test_overriding_subclasses_are_not_bypassed(self):
+        """
+        Test that subclasses overriding the model methods are simulated through those methods.
+        """
+        scaled = CrossFlowFiltrationModel(
+            self.volume, self.concentration, self.tmp, self.membrane_area, self.mwco,
+            self.concentration_factor, termination_criteria=self.termination_criteria,
+            resistance_model=ScaledResistanceModel()
+        )
+        self.assertAlmostEqual(scaled.run_simulation(time_step=ONE_HOUR).final_permeate_volume,
+                               self.model.run_simulation(time_step=ONE_HOUR).final_permeate_volume / 10)
+
+        early = CrossFlowFiltrationModel(
+            self.volume, self.concentration, self.tmp, self.membrane_area, self.mwco,
+            self.concentration_factor, termination_criteria=EarlyMaxTimeTermination(5*ONE_HOUR)
+        )
+        self.assertEqual(early.run_simulation(time_step=ONE_HOUR).time, 3*ONE_HOUR)
+
+    def test_simulate_core_matches_vectorized_simulation(self):
+        """
+        Test that the compiled simulation loop reproduces the vectorized simulation.
+        """
+        resistance_model = SimplifiedResistanceModel()
+        for max_steps in (0, 5, 100_000, -1):
+            args = (float(self.volume), self.tmp, WaterViscosityModel().calculate_viscosity(), self.membrane_area,
+                    float(self.concentration_factor), ONE_HOUR.total_seconds(), resistance_model.TIME_COEFFICIENT_A,
+                    resistance_model.TIME_COEFFICIENT_B, resistance_model.TIME_EXPONENT, max_steps)
+            compiled = _simulate_core(*args)
+            vectorized = _simulate_vectorized(*args)
+            self.assertEqual(compiled[3], vectorized[3])
+            for compiled_value, vectorized_value in zip(compiled[:3], vectorized[:3]):
+                self.assertAlmostEqual(compiled_value, vectorized_value)
+
+    def test_run_simulation_without_termination_criteria_reaches_concentration_factor(self):
+        """
+        Test that a simulation without a time limit runs until the concentration factor is reached.
+        """
+        model = CrossFlowFiltrationModel(
+            self.volume, self.concentration, self.tmp, self.membrane_area, self.mwco, self.concentration_factor
+        )
+        simulation_result = model.run_simulation(time_step=ONE_HOUR)
+        self.assertGreaterEqual(simulation_result.final_concentration, self.concentration_factor)
+        self.assertGreater(simulation_result.time, 5*ONE_HOUR)
+
+    @unittest.skipUnless(SCIPY_AVAILABLE, "scipy is not installed")
+    def test_analytic_simulation_matches_fine_time_step(self):
+        """
+        Test that solving the continuous model agrees with a simulation using a small time step.
+        """
+        fine_time_step = timedelta(milliseconds=10)
+
+        # Concentration factor reached after a few hours
+        model = CrossFlowFiltrationModel(
+            self.volume, self.concentration, self.tmp, 50_000.0, self.mwco, self.concentration_factor
+        )
+        analytic = model.run_simulation(time_step=None)
+        stepped = model.run_simulation(time_step=fine_time_step)
+        self.assertAlmostEqual(analytic.time / ONE_HOUR, stepped.time / ONE_HOUR, delta=1e-2)
+        self.assertAlmostEqual(analytic.final_permeate_volume, stepped.final_permeate_volume, places=5)
+        self.assertAlmostEqual(analytic.final_concentration, self.concentration_factor)
+
+        # Maximum simulation time reached first
+        analytic = self.model.run_simulation(time_step=None)
+        stepped = self.model.run_simulation(time_step=fine_time_step)
+        self.assertEqual(analytic.time, TERMINATION_CRITERIA_FOR_TEST.max_time)
+        self.assertAlmostEqual(analytic.final_permeate_volume / stepped.final_permeate_volume, 1, delta=1e-2)
+
+    @unittest.skipUnless(SCIPY_AVAILABLE, "scipy is not installed")
+    def test_analytic_simulation_without_time_limit_converges(self):
+        """
+        Test that the integration converges, without warnings, over the long bracket of an unlimited run.
+        """
+        model = CrossFlowFiltrationModel(
+            self.volume, self.concentration, self.tmp, self.membrane_area, self.mwco, self.concentration_factor
+        )
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            analytic = model.run_simulation(time_step=None)
+        self.assertAlmostEqual(analytic.final_concentration, self.concentration_factor)
+        self.assertGreater(analytic.time, 5*ONE_HOUR)
+
+    def test_analytic_simulation_requires_closed_form_termination(self):
+        model = CrossFlowFiltrationModel(
+            self.volume, self.concentration, self.tmp, self.membrane_area, self.mwco,
+            self.concentration_factor, termination_criteria=SteppedMaxTimeTermination(5*ONE_HOUR)
+        )
+        with self.assertRaises(ValueError):
+            model.run_simulation(time_step=None)
+
+    def test_simulate_batch_matches_run_simulation(self):
+        """
+        Test that a batch of simulations gives the same results as running each sample on its own.
+        """
+        params = {
+            'volume': [1.0, 1.0, 2.0, 1.0],
+            'concentration': self.concentration,
+            'tmp': [100000.0, 500000.0, 100000.0, 100000.0],
+            'membrane_area': [5.0, 5.0, 50_000.0, 50_000.0],
+            'mwco': [40000.0, 40000.0, 40000.0, 10000.0],
+            'concentration_factor': [2, 2, 5, 2],
+        }
+        max_time = 100*ONE_HOUR
+        batch = CrossFlowFiltrationModel.simulate_batch(params, time_step=ONE_HOUR, max_time=max_time)
+        for i in range(4):
+            simulation_result = CrossFlowFiltrationModel(
+                volume=params['volume'][i],
+                concentration=params['concentration'],
+                tmp=params['tmp'][i],
+                membrane_area=params['membrane_area'][i],
+                mwco=params['mwco'][i],
+                concentration_factor=params['concentration_factor'][i],
+                termination_criteria=MaxSimulationTimeTermination(max_time)
+            ).run_simulation(time_step=ONE_HOUR)
+            self.assertEqual(batch.time[i], simulation_result.time)
+            self.assertAlmostEqual(batch.final_permeate_volume[i], simulation_result.final_permeate_volume)
+            self.assertAlmostEqual(batch.final_retentate_volume[i], simulation_result.final_retentate_volume)
+            self.assertAlmostEqual(batch.final_concentration[i], simulation_result.final_concentration)
+
+    def test_simulate_batch_validates_parameters(self):
+        params = {
+            'volume': 1.0,
+            'concentration': self.concentration,
+            'tmp': [100000.0, 800000.0],
+            'membrane_area': 5.0,
+            'mwco': 40000.0,
+            'concentration_factor': 2,
+        }
+        with self.assertRaises(ValueError):
+            CrossFlowFiltrationModel.simulate_batch(params, time_step=ONE_HOUR, max_time=5*ONE_HOUR)
+
+        params['tmp'] = 100000.0
+        with self.assertRaises(ValueError):
+            CrossFlowFiltrationModel.simulate_batch(params, time_step=ONE_HOUR, max_time=5*ONE_HOUR,
+                                                    resistance_model=ScaledResistanceModel())
+
+    def test_current_concentration_is_deprecated(self):
+        with self.assertWarns(DeprecationWarning):
+            concentration_factor = self.model.current_concentration(self.volume / 2)
+        self.assertEqual(concentration_factor, self.model.current_concentration_factor(self.volume / 2))
+
+    def test_concentration_factor_before_first_step(self):
+        """
+        Test that the concentration factor is 1 when no time step has been taken.
+        """
+        self.assertEqual(self.model.current_concentration_factor(self.volume), 1.0)
+        for termination_criteria in (MaxSimulationTimeTermination(timedelta(0)), SteppedMaxTimeTermination(timedelta(0))):
+            simulation_result = CrossFlowFiltrationModel(
+                self.volume, self.concentration, self.tmp, self.membrane_area, self.mwco,
+                self.concentration_factor, termination_criteria=termination_criteria
+            ).run_simulation(time_step=ONE_HOUR)
+            self.assertEqual(simulation_result.final_concentration, 1.0)
+            self.assertEqual(simulation_result.time, timedelta(0))
+
+    def restore_logging_after_test(self):
+        """
+        Reconfigures the logging set up before the test (e.g. through CROSS_FLOW_MODEL_LOG) once it finishes.
+        """
+        if core._log_handler is None:
+            self.addCleanup(reset_logging)
+        else:
+            self.addCleanup(configure_logging, core._log_file_handler.baseFilename,
+                            buffered=core._log_handler is not core._log_file_handler)
+
+    def test_configure_logging_writes_buffered_records_after_simulation(self):
+        """
+        Test that buffered log records reach the log file once the simulation completes.
+        """
+        self.restore_logging_after_test()
+        with tempfile.TemporaryDirectory() as log_dir:
+            log_path = os.path.join(log_dir, 'cross_flow_model.log')
+            handler = configure_logging(log_path)
+            try:
+                self.assertIsInstance(handler, logging.handlers.MemoryHandler)
+                self.model.run_simulation(time_step=ONE_HOUR)
+                with open(log_path) as log_file:
+                    self.assertIn("Simulation completed", log_file.read())
+            finally:
+                reset_logging()
+            self.assertNotIn(handler, logger.handlers)
+            self.assertEqual(logger.level, logging.NOTSET)
+
+    def test_configure_logging_after_handler_was_closed(self):
+        """
+        Test that logging can be configured again after its handler was closed, e.g. by logging.shutdown().
+        """
+        self.restore_logging_after_test()
+        with tempfile.TemporaryDirectory() as log_dir:
+            try:
+                configure_logging(os.path.join(log_dir, 'first.log')).close()
+                log_path = os.path.join(log_dir, 'second.log')
+                configure_logging(log_path)
+                with self.assertRaises(ZeroDivisionError):
+                    CrossFlowFiltrationModel(
+                        self.volume, self.concentration, self.tmp, self.membrane_area, self.mwco,
+                        self.concentration_factor, termination_criteria=SteppedMaxTimeTermination(5*ONE_HOUR),
+                        resistance_model=ZeroResistanceModel()
+                    ).run_simulation(time_step=ONE_HOUR)
+                with open(log_path) as log_file:
+                    self.assertIn("Simulation started", log_file.read())
+            finally:
+                reset_logging()
+
+    @unittest.skipUnless(JOBLIB_AVAILABLE, "joblib is not installed")
+    def test_configure_cache_reuses_simulations(self):
+        """
+        Test that simulations are cached on disk once caching is configured.
+        """
+        model = CrossFlowFiltrationModel(
+            self.volume, self.concentration, self.tmp, self.membrane_area, self.mwco, self.concentration_factor
+        )
+        uncached = model.run_simulation(time_step=ONE_HOUR)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            def cached_file_count():
+                return sum(len(file_names) for _, _, file_names in os.walk(cache_dir))
+
+            configure_cache(cache_dir)
+            try:
+                empty_cache_file_count = cached_file_count()
+                first = model.run_simulation(time_step=ONE_HOUR)
+                self.assertGreater(cached_file_count(), empty_cache_file_count)
+                second = model.run_simulation(time_step=ONE_HOUR)
+            finally:
+                disable_cache()
+        for simulation_result in (first, second):
+            self.assertEqual(simulation_result.time, uncached.time)
+            self.assertEqual(simulation_result.final_permeate_volume, uncached.final_permeate_volume)
+
     def test_validate_parameter(self):
         """
         Test the validate_parameter function.
@@ -74,6 +451,41 @@ class TestCrossFlowFiltrationModel(unittest.TestCase):
         with self.assertRaises(ValueError):
             validate_parameter('Test Parameter', 25, min_value=10, max_value=20)
 
+    def test_resistance_model(self):
+        resistance_model = SimplifiedResistanceModel()
+        self.assertEqual(resistance_model.calculate_resistance(timedelta(0)), resistance_model.TIME_COEFFICIENT_A)
+        expected = (resistance_model.TIME_COEFFICIENT_A
+                    + resistance_model.TIME_COEFFICIENT_B * (2*ONE_HOUR).total_seconds()**resistance_model.TIME_EXPONENT)
+        self.assertEqual(resistance_model.calculate_resistance(2*ONE_HOUR), expected)
+        self.assertEqual(resistance_model.calculate_resistance(2*ONE_HOUR), expected)
+        self.assertEqual(resistance_model.calculate_resistance((2*ONE_HOUR).total_seconds()), expected)
+
+    def test_typical_ranges_are_read_only(self):
+        self.assertEqual(TYPICAL_RANGES['TMP'].min, 50_000)
+        self.assertEqual(TYPICAL_RANGES['TMP'].max, 700_000)
+        with self.assertRaises(TypeError):
+            TYPICAL_RANGES['TMP'] = (0, 1)
+
+    def test_resistance_model_with_zero_exponent(self):
+        """
+        Test that a coefficient-only subclass gets the same resistance at t = 0 on every path.
+        """
+        resistance_model = ConstantResistanceModel()
+        self.assertEqual(resistance_model.calculate_resistance(timedelta(0)),
+                         resistance_model.TIME_COEFFICIENT_A + resistance_model.TIME_COEFFICIENT_B)
+
+        closed_form = CrossFlowFiltrationModel(
+            self.volume, self.concentration, self.tmp, self.membrane_area, self.mwco,
+            self.concentration_factor, termination_criteria=self.termination_criteria,
+            resistance_model=resistance_model
+        ).run_simulation(time_step=ONE_HOUR)
+        stepped = CrossFlowFiltrationModel(
+            self.volume, self.concentration, self.tmp, self.membrane_area, self.mwco,
+            self.concentration_factor, termination_criteria=SteppedMaxTimeTermination(5*ONE_HOUR),
+            resistance_model=DelegatingResistanceModel(resistance_model)
+        ).run_simulation(time_step=ONE_HOUR)
+        self.assertAlmostEqual(closed_form.final_permeate_volume, stepped.final_permeate_volume)
+
     def test_resistance_model_without_time(self):
         with self.assertRaises(TypeError):
             self.model.resistance_model.calculate_resistance()